@@ -22,32 +22,52 @@ import pandas as pd
 
 import json
 
+import hashlib
+
+import io
+
+import base64
+
 import requests
 
+from requests.adapters import HTTPAdapter
+
+from requests.compat import chardet
+
+from urllib3.util.retry import Retry
+
 import sys
 
-# 依存関係チェック（bs4 不足時に明示して停止）
+# 依存関係チェック（bs4 / lxml 不足時に明示して停止）
 _BS4_VERSION = None
 try:
     from bs4 import BeautifulSoup  # type: ignore
     import bs4 as _bs4  # type: ignore
     _BS4_VERSION = getattr(_bs4, "__version__", "unknown")
+    import lxml.html  # type: ignore
 except Exception:
     st.error(
-        "依存パッケージ 'beautifulsoup4' が見つかりません。requirements.txt がデプロイで読み込まれているか確認してください。"
+        "依存パッケージ 'beautifulsoup4' または 'lxml' が見つかりません。requirements.txt がデプロイで読み込まれているか確認してください。"
     )
     st.stop()
+
+# HTMLパーサー（C 実装の lxml を使用）
+_HTML_PARSER = "lxml"
 import sqlite3
 
 import os
 
-from datetime import datetime
+import shutil
+
+from datetime import date, datetime
 
 import re
 
 import unicodedata
 
-from difflib import SequenceMatcher
+from rapidfuzz import fuzz, process
+
+from cryptography.fernet import Fernet, InvalidToken
 
 from docx import Document
 
@@ -69,6 +89,26 @@ import time
 
 import threading
 
+from typing import NamedTuple
+
+from contextlib import contextmanager
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+
+# 申請一覧の1ページあたりの表示件数
+APPLICATIONS_PAGE_SIZE = 25
+
+# 管理者モードを判定するURLクエリパラメータのキー
+ADMIN_QUERY_KEYS = ("role", "mode", "page")
+
+# 設定の秘密値を暗号化する鍵ファイル（環境変数 KNE_SETTINGS_KEY 未設定時に使用、.gitignore 対象）
+SETTINGS_KEY_PATH = "settings.key"
+
+# 暗号化済みの設定値に付ける接頭辞（暗号化前の平文と区別する）
+_ENCRYPTED_PREFIX = "enc:"
+
 
 
 # ページ設定
@@ -85,10 +125,59 @@ st.set_page_config(
 
 
 
+class Team(NamedTuple):
+    """JBAチーム検索結果の1件"""
+    id: str
+    name: str
+    url: str
+
+
+class Member(NamedTuple):
+    """JBAチームメンバー表の1行"""
+    member_id: str
+    name: str
+    birth_date: str
+
+
+
+# 照合時に氏名から取り除く文字（空白類・中黒、全角はNFKCで半角/・に揃う）
+_NAME_STRIP_TABLE = str.maketrans('', '', ' \u3000\t\r\n・')
+
+
+def _normalize_name(name):
+    """氏名を照合用に正規化（NFKC・小文字化・空白/中黒除去）"""
+    return unicodedata.normalize('NFKC', name).lower().translate(_NAME_STRIP_TABLE)
+
+
+
 class JBAVerificationSystem:
 
     """JBA検証システム（requests + BeautifulSoupベース）"""
 
+    # メンバーテーブル（10行超で、先頭行が「メンバーID / 氏名 / 生年月日」）のヘッダー以外の行
+    _MEMBER_ROWS_XPATH = (
+        "((//table[count(.//tr) > 10 and (.//tr)[1]["
+        "(td|th)[1][contains(., 'メンバーID')] and "
+        "(td|th)[2][contains(., '氏名')] and "
+        "(td|th)[3][contains(., '生年月日')]"
+        "]])[1]//tr)[position() > 1]"
+    )
+
+    # 行数を問わず、先頭行が「メンバーID / 氏名 / 生年月日」のテーブルがあるか（ログイン画面などとの判別用）
+    _HAS_MEMBER_TABLE_XPATH = (
+        "boolean(//table[(.//tr)[1]["
+        "(td|th)[1][contains(., 'メンバーID')] and "
+        "(td|th)[2][contains(., '氏名')] and "
+        "(td|th)[3][contains(., '生年月日')]"
+        "]])"
+    )
+
+    # JBAの生年月日表記（例: 2004年5月31日）
+    _DATE_RE = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')
+
+    # JBAへのリクエストのタイムアウト（接続, 読み込み）秒と、ページ取得時のレスポンス上限
+    _TIMEOUT = (5, 15)
+    _MAX_PAGE_BYTES = 2_000_000
 
     
     def __init__(self):
@@ -121,27 +210,82 @@ class JBAVerificationSystem:
 
         })
 
+        # team-jba.jp への接続を使い回す（keep-alive のプールを広げ、一時的なエラーは再試行）
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount("https://team-jba.jp", adapter)
+
         self.logged_in = False
+
+        # 取得結果のキャッシュ（同じ大学・チームを選手ごとに再取得しない）
+        self._team_cache = {}  # (大学名, 年度) -> チーム一覧
+        self._member_cache = {}  # チームURL -> メンバー情報
+        self._index_cache = {}  # (大学名, 年度) -> 正規化氏名の索引
+
+        # 年度のキャッシュ（get_current_fiscal_year で日付が変わったときのみ再計算）
+        self._fiscal_year = None
+        self._fiscal_year_date = None
+
+
+
+    def clear_cache(self):
+
+        """チーム検索・メンバー情報のキャッシュを破棄"""
+
+        self._team_cache.clear()
+
+        self._member_cache.clear()
+
+        self._index_cache.clear()
     
 
 
-    def get_current_fiscal_year(self):
+    def _get(self, url, max_bytes=None):
 
-        """現在の年度を取得"""
+        """GETして本文を上限サイズまで読み込み、(ステータスコード, デコード済み本文) を返す"""
 
-        current_year = datetime.now().year
+        max_bytes = max_bytes or self._MAX_PAGE_BYTES
 
-        current_month = datetime.now().month
+        with self.session.get(url, stream=True, timeout=self._TIMEOUT) as response:
 
+            body = response.raw.read(max_bytes + 1, decode_content=True)
 
-        
-        if current_month >= 1:
+        if len(body) > max_bytes:
 
-            return str(current_year)
+            raise RuntimeError(f"レスポンスが上限（{max_bytes}バイト）を超えています: {url}")
 
-        else:
+        # bytes のまま lxml に渡すと <meta charset> の無いページが Latin-1 扱いになるため、ここで文字列にする
+        # （HTTPヘッダーの charset → UTF-8 → 推定 の順）
+        encoding = (response.encoding if 'charset=' in response.headers.get('Content-Type', '').lower() else None) or 'utf-8'
+
+        try:
+
+            return response.status_code, body.decode(encoding)
+
+        except (LookupError, UnicodeDecodeError):
+
+            encoding = chardet.detect(body)['encoding'] or 'utf-8'
+
+        return response.status_code, body.decode(encoding, errors='replace')
+    
+
+
+    def get_current_fiscal_year(self):
+
+        """現在の年度を取得（4月始まり、日付が変わるまでは計算結果を再利用）"""
+
+        today = date.today()
+
+        if self._fiscal_year_date != today:
+
+            self._fiscal_year = str(today.year if today.month >= 4 else today.year - 1)
 
-            return str(current_year - 1)
+            self._fiscal_year_date = today
+
+        return self._fiscal_year
     
 
 
@@ -151,13 +295,9 @@ class JBAVerificationSystem:
 
         try:
 
-            st.info("🔐 JBAサイトにログイン中...")
-
+            login_page = self.session.get("https://team-jba.jp/login", timeout=self._TIMEOUT)
 
-            
-            login_page = self.session.get("https://team-jba.jp/login")
-
-            soup = BeautifulSoup(login_page.content, 'html.parser')
+            soup = BeautifulSoup(login_page.content, _HTML_PARSER)
 
 
             
@@ -185,7 +325,7 @@ class JBAVerificationSystem:
             
             login_url = "https://team-jba.jp/login/done"
 
-            login_response = self.session.post(login_url, data=login_data, allow_redirects=True)
+            login_response = self.session.post(login_url, data=login_data, allow_redirects=True, timeout=self._TIMEOUT)
 
 
             
@@ -195,6 +335,8 @@ class JBAVerificationSystem:
 
                 self.logged_in = True
 
+                self.clear_cache()
+
                 return True
 
             else:
@@ -229,6 +371,10 @@ class JBAVerificationSystem:
 
             current_year = self.get_current_fiscal_year()
 
+            cache_key = (university_name, current_year)
+            if cache_key in self._team_cache:
+                return self._team_cache[cache_key]
+
             st.info(f"🔍 {university_name}の男子チームを検索中... ({current_year}年度)")
 
 
@@ -237,11 +383,11 @@ class JBAVerificationSystem:
 
             search_url = "https://team-jba.jp/organization/15250600/team/search"
 
-            search_page = self.session.get(search_url)
+            search_status, search_page = self._get(search_url)
 
 
             
-            if search_page.status_code != 200:
+            if search_status != 200:
 
                 st.error("❌ 検索ページにアクセスできません")
 
@@ -249,7 +395,7 @@ class JBAVerificationSystem:
             
 
 
-            soup = BeautifulSoup(search_page.content, 'html.parser')
+            soup = BeautifulSoup(search_page, _HTML_PARSER)
 
 
             
@@ -282,7 +428,10 @@ class JBAVerificationSystem:
 
                     {"field": "competition_division_id", "type": "int", "operator": "is", "value": 1},
 
-                    {"field": "team_search_out_of_range", "type": "int", "operator": "is", "value": 1}
+                    {"field": "team_search_out_of_range", "type": "int", "operator": "is", "value": 1},
+
+                    # 男子チームのみをサーバー側で絞り込む（レスポンスを小さくする）
+                    {"field": "team_gender_id", "type": "text", "operator": "is", "value": "男子"}
 
                 ]
             
@@ -309,7 +458,9 @@ class JBAVerificationSystem:
 
                 data=form_data,
 
-                headers=headers
+                headers=headers,
+
+                timeout=self._TIMEOUT
             )
 
 
@@ -326,24 +477,31 @@ class JBAVerificationSystem:
             try:
                 
                 data = search_response.json()
-                teams = []
 
 
-                if data.get('status') == 'success' and 'records' in data:
-                    for team_data in data['records']:
-                        # 男子チームのみを対象
-                        if team_data.get('team_gender_id') == '男子':
-                            teams.append({
+                if data.get('status') != 'success' or 'records' not in data:
+                    # CSRF・セッション切れなどの失敗応答はキャッシュしない
+                    st.error(f"❌ 検索結果を取得できませんでした (status: {data.get('status')})")
+                    return []
 
-                                'id': team_data.get('id', ''),
-                                'name': team_data.get('team_name', ''),
-                                'url': f"https://team-jba.jp/organization/15250600/team/{team_data.get('id', '')}/detail"
-                            })
+
+                # 男子チームのみを対象（サーバー側の絞り込みが効かない場合の保険）
+                teams = [
+                    Team(
+                        record.get('id', ''),
+                        record.get('team_name', ''),
+                        f"https://team-jba.jp/organization/15250600/team/{record.get('id', '')}/detail"
+                    )
+                    for record in data['records']
+                    if record.get('team_gender_id') == '男子'
+                ]
 
 
 
                 st.success(f"✅ {university_name}の男子チーム: {len(teams)}件見つかりました")
 
+                self._team_cache[cache_key] = teams
+
                 return teams
                 
 
@@ -367,122 +525,157 @@ class JBAVerificationSystem:
         """チームのメンバー情報を取得（男子チームのみ）"""
         try:
 
-            st.info(f"📊 チームメンバー情報を取得中...")
+            return self._fetch_team_members(team_url)
+            
 
 
-            
-            # チーム詳細ページにアクセス
+        except Exception as e:
 
-            team_page = self.session.get(team_url)
+            st.error(f"❌ メンバー取得エラー: {str(e)}")
 
+            import traceback
+            st.write(f"**エラー詳細**: {traceback.format_exc()}")
+            return {"team_name": "Error", "team_url": team_url, "members": [], "error": True}
+    
 
-            
-            if team_page.status_code != 200:
 
-                st.error(f"❌ チームページにアクセスできません (Status: {team_page.status_code})")
-                return {"team_name": "Error", "members": []}
-            
+    def _fetch_team_members(self, team_url):
 
+        """チームページからメンバー情報を抽出（Streamlitへの表示は行わないためスレッドから呼び出し可能）"""
 
-            soup = BeautifulSoup(team_page.content, 'html.parser')
+        if team_url in self._member_cache:
+            return self._member_cache[team_url]
 
+        # チーム詳細ページにアクセス
 
-            
-            # チーム名を取得
+        team_status, team_page = self._get(team_url)
 
-            team_name = "Unknown Team"
-            title_element = soup.find('title')
-            if title_element:
-                team_name = title_element.get_text(strip=True)
 
-            # メンバー情報を抽出（男子チームのメンバーテーブルを特定）
-            members = []
-            
-            tables = soup.find_all('table')
-
-            # 男子チームのメンバーテーブルを探す（3列のテーブルを探す）
-            member_table = None
-            for i, table in enumerate(tables):
-                rows = table.find_all('tr')
-                if len(rows) > 10:  # メンバーテーブルは通常10行以上
-                    # 最初の行に「メンバーID / 氏名 / 生年月日」があるかチェック
-                    first_row_cells = rows[0].find_all(['td', 'th'])
-                    if len(first_row_cells) >= 3:
-                        first_cell = first_row_cells[0].get_text(strip=True)
-                        second_cell = first_row_cells[1].get_text(strip=True)
-                        third_cell = first_row_cells[2].get_text(strip=True)
-                        if "メンバーID" in first_cell and "氏名" in second_cell and "生年月日" in third_cell:
-                            member_table = table
-                            break
-
-            if member_table:
-                rows = member_table.find_all('tr')
-                for row in rows[1:]:  # ヘッダー行をスキップ
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 3:
-                        member_id = cells[0].get_text(strip=True)
-
-                        name = cells[1].get_text(strip=True)
-                        birth_date = cells[2].get_text(strip=True)
-                        
+        
+        if team_status != 200:
 
+            raise RuntimeError(f"チームページにアクセスできません (Status: {team_status})")
+        
 
-                        # メンバーIDが数字で、名前が空でない場合のみ追加
-                        if member_id.isdigit() and name and name != "氏名":
-                            members.append({
-                                "member_id": member_id,
-                                "name": name,
-                                "birth_date": birth_date
-                            })
 
+        root = lxml.html.fromstring(team_page)
 
 
-            return {
+        
+        # チーム名を取得（<head> 直下のみを参照し、文書全体は走査しない）
 
-                "team_name": team_name,
+        team_name = (root.findtext('head/title') or "").strip() or "Unknown Team"
 
-                "members": members
+        # メンバー情報を抽出（男子チームのメンバーテーブルのデータ行をXPathで一括取得）
+        members = []
 
-            }
-            
+        for row in root.xpath(self._MEMBER_ROWS_XPATH):
+            cells = row.xpath('./td|./th')
+            if len(cells) >= 3:
+                member_id, name, birth_date = (
+                    "".join(text.strip() for text in cell.itertext()) for cell in cells[:3]
+                )
 
+                # メンバーIDが数字で、名前が空でない場合のみ追加
+                if member_id.isdigit() and name and name != "氏名":
+                    members.append(Member(member_id, name, birth_date))
 
-        except Exception as e:
 
-            st.error(f"❌ メンバー取得エラー: {str(e)}")
 
-            import traceback
-            st.write(f"**エラー詳細**: {traceback.format_exc()}")
-            return {"team_name": "Error", "team_url": team_url, "members": []}
+        team_data = {
+
+            "team_name": team_name,
+
+            "members": members
+
+        }
+
+        # メンバー表自体が無いページ（ログアウト後のログイン画面など）は取得失敗として扱い、キャッシュしない
+        if not members and not root.xpath(self._HAS_MEMBER_TABLE_XPATH):
+            raise RuntimeError(f"メンバー表が見つかりません（ログインが切れている可能性があります）: {team_url}")
+
+        self._member_cache[team_url] = team_data
+
+        return team_data
     
 
 
-    def normalize_date_format(self, date_str):
-        """日付フォーマットを統一（JBAの「2004年5月31日」形式に対応）"""
-        try:
-            if not date_str:
-                return ""
-
-            # JBAの「2004年5月31日」形式を処理
-            if "年" in date_str and "月" in date_str and "日" in date_str:
-                # 「2004年5月31日」→「2004/5/31」に変換
-                import re
-                match = re.match(r'(\d{4})年(\d{1,2})月(\d{1,2})日', date_str)
-                if match:
-                    year, month, day = match.groups()
-                    return f"{year}/{int(month)}/{int(day)}"
-
-            # 既に統一された形式の場合はそのまま返す
-            if "/" in date_str and len(date_str.split("/")) == 3:
-                parts = date_str.split("/")
-                year = parts[0]
-                month = str(int(parts[1]))  # 先頭の0を削除
-                day = str(int(parts[2]))    # 先頭の0を削除
-                return f"{year}/{month}/{day}"
-
-            return date_str
-        except:
-            return date_str
+    def fetch_teams_members(self, teams, max_workers=8):
+
+        """複数チームのメンバー情報を並列に取得（結果はteamsと同じ順序、取得失敗したチームは "error": True、進捗表示はメインスレッドで行う）"""
+
+        results = [None] * len(teams)
+
+        progress = st.progress(0.0, text=f"チーム 0/{len(teams)} を処理中...")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._fetch_team_members, team.url): i for i, team in enumerate(teams)}
+
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    st.error(f"❌ メンバー取得エラー: {str(e)}")
+                    results[i] = {"team_name": "Error", "team_url": teams[i].url, "members": [], "error": True}
+
+                progress.progress(done / len(teams), text=f"チーム {done}/{len(teams)} を処理中...")
+
+        progress.empty()
+
+        return results
+    
+
+
+    def _parse_date_tuple(self, date_str):
+        """生年月日を (年, 月, 日) に変換（JBAの「2004年5月31日」形式と「2004/05/31」形式に対応、解釈できない場合は None）"""
+        if not date_str:
+            return None
+
+        # JBAの「2004年5月31日」形式
+        match = self._DATE_RE.match(date_str)
+        if match:
+            return tuple(int(value) for value in match.groups())
+
+        # 申請データの「2004/05/31」形式（先頭の0は無視）
+        parts = date_str.split("/")
+        if len(parts) == 3:
+            try:
+                return tuple(int(part) for part in parts)
+            except ValueError:
+                return None
+
+        return None
+
+    def build_university_index(self, university):
+        """大学の男子チーム全メンバーを索引化
+
+        戻り値は ({正規化氏名: [メンバー, ...]}, {(正規化氏名, (年, 月, 日)): メンバー}) のタプル
+        """
+        cache_key = (university, self.get_current_fiscal_year())
+        if cache_key in self._index_cache:
+            return self._index_cache[cache_key]
+
+        by_name = {}
+        by_name_date = {}
+        teams = self.search_teams_by_university(university)
+        # チーム検索自体が失敗した場合（_team_cache に残らない）も索引はキャッシュしない
+        complete = cache_key in self._team_cache
+        if teams:
+            for team_data in self.fetch_teams_members(teams):
+                if team_data.get("error"):
+                    complete = False
+                for member in team_data["members"]:
+                    name_key = _normalize_name(member.name)
+                    by_name.setdefault(name_key, []).append(member)
+                    date_key = self._parse_date_tuple(member.birth_date)
+                    if date_key:
+                        by_name_date.setdefault((name_key, date_key), member)
+
+        # 取得に失敗したチームを含む索引は、一時的な障害を「該当なし」として残さないようキャッシュしない
+        if complete:
+            self._index_cache[cache_key] = (by_name, by_name_date)
+        return by_name, by_name_date
 
     def verify_player_info(self, player_name, birth_date, university):
         """個別選手情報の照合（男子チームのみ）"""
@@ -493,36 +686,39 @@ class JBAVerificationSystem:
             if not teams:
                 return {"status": "not_found", "message": f"{university}の男子チームが見つかりませんでした"}
 
-            # 入力された生年月日を正規化
-            normalized_input_date = self.normalize_date_format(birth_date)
+            by_name, by_name_date = self.build_university_index(university)
+
+            # 正規化氏名の完全一致を優先し、見つからない場合のみあいまい検索
+            name_key = _normalize_name(player_name)
+            name_similarity = 1.0
+            if name_key not in by_name and by_name:
+                found = process.extractOne(name_key, by_name.keys(), scorer=fuzz.ratio, score_cutoff=80)
+                # 従来の SequenceMatcher の ratio() > 0.8 と同じく、ちょうど80は一致とみなさない
+                if found and found[1] > 80:
+                    name_key, score, _ = found
+                    name_similarity = score / 100
+
+            candidates = by_name.get(name_key)
+            if not candidates:
+                return {"status": "not_found", "message": "JBAデータベースに該当する選手が見つかりませんでした"}
+
+            # 生年月日の照合（入力を一度だけ (年, 月, 日) に変換して索引を引く）
+            member = by_name_date.get((name_key, self._parse_date_tuple(birth_date)))
+            if member:
+                return {
+                    "status": "match",
+                    "jba_data": member,
+                    "similarity": name_similarity
+                }
 
-            # 各チームのメンバー情報を取得して照合
-            for team in teams:
-                team_data = self.get_team_members(team['url'])
-                if team_data and team_data["members"]:
-                    for member in team_data["members"]:
-                        # 名前の類似度チェック
-                        name_similarity = SequenceMatcher(None, player_name, member["name"]).ratio()
-
-                        # 生年月日の照合（正規化された形式で比較）
-                        jba_date = self.normalize_date_format(member["birth_date"])
-                        birth_match = normalized_input_date == jba_date
-
-                        if name_similarity > 0.8 and birth_match:
-                            return {
-                                "status": "match",
-                                "jba_data": member,
-                                "similarity": name_similarity
-                            }
-                        elif name_similarity > 0.8:  # 名前は一致するが生年月日が異なる場合
-                            return {
-                                "status": "name_match_birth_mismatch",
-                                "jba_data": member,
-                                "similarity": name_similarity,
-                                "message": f"名前は一致しますが、生年月日が異なります。JBA登録: {member['birth_date']}"
-                            }
-
-            return {"status": "not_found", "message": "JBAデータベースに該当する選手が見つかりませんでした"}
+            # 名前は一致するが生年月日が異なる場合
+            member = candidates[0]
+            return {
+                "status": "name_match_birth_mismatch",
+                "jba_data": member,
+                "similarity": name_similarity,
+                "message": f"名前は一致しますが、生年月日が異なります。JBA登録: {member.birth_date}"
+            }
 
         except Exception as e:
             return {"status": "error", "message": f"照合エラー: {str(e)}"}
@@ -558,15 +754,11 @@ class JBAVerificationSystem:
 
         all_members = []
 
-        for i, team in enumerate(teams):
-
-            with st.spinner(f"チーム {i+1}/{len(teams)} を処理中..."):
+        for team_data in self.fetch_teams_members(teams):
 
-                team_data = self.get_team_members(team['url'])
+            if team_data and team_data["members"]:
 
-                if team_data and team_data["members"]:
-
-                    all_members.extend(team_data["members"])
+                all_members.extend(team_data["members"])
         
 
 
@@ -590,15 +782,95 @@ class DatabaseManager:
 
         self.db_path = db_path
 
+        # 共有コネクション（操作ごとに開き直さず、スキーマやページキャッシュを使い回す）
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+
+        self._conn.execute('PRAGMA journal_mode=WAL')
+
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+
+        self._conn.execute('PRAGMA cache_size=-20000')
+
+        self._conn.execute('PRAGMA mmap_size=268435456')
+
+        # 書き込みを直列化するロック
+        self._write_lock = threading.Lock()
+
         self.init_database()
     
 
 
+    def connect(self):
+
+        """共有コネクションを取得（呼び出し側で close しないこと）"""
+
+        return self._conn
+    
+
+
+    def data_version(self):
+
+        """共有コネクションでの累計変更行数（書き込みのたびに増えるため、読み取りキャッシュのキーに使う）"""
+
+        return self._conn.total_changes
+    
+
+
+    @contextmanager
+    def transaction(self):
+
+        """書き込み用トランザクション（正常終了でコミット、例外時はロールバック）"""
+
+        with self._write_lock, self._conn:
+
+            yield self._conn
+    
+
+
+    def bulk_insert_applications(self, rows):
+
+        """申請をまとめて登録（1トランザクション・1回のコミット）し、採番された申請IDを返す"""
+
+        with self.transaction() as conn:
+
+            cursor = conn.cursor()
+
+            # 採番範囲を確定させるため、最初に書き込みロックを取得
+            cursor.execute('BEGIN IMMEDIATE')
+
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM player_applications')
+
+            last_id = cursor.fetchone()[0]
+
+            cursor.executemany('''
+                INSERT INTO player_applications 
+                (tournament_id, player_name, birth_date, university, division, role, remarks, photo_path, jba_file_path, staff_file_path, verification_result, jba_match_data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+            cursor.execute('SELECT id FROM player_applications WHERE id > ? ORDER BY id', (last_id,))
+
+            return [row[0] for row in cursor.fetchall()]
+    
+
+
+    def update_verification_results(self, changes):
+
+        """照合結果をまとめて更新（changes: [(照合結果, 申請ID), ...]、1トランザクション・1回のコミット）"""
+
+        with self.transaction() as conn:
+
+            conn.executemany('UPDATE player_applications SET verification_result = ? WHERE id = ?', changes)
+    
+
+
     def init_database(self):
 
         """データベースを初期化"""
 
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
 
         cursor = conn.cursor()
 
@@ -740,9 +1012,45 @@ class DatabaseManager:
 
 
         
-        conn.commit()
+        # インデックス（大会ごとの申請一覧を申請日の新しい順に取得、同時刻は新しい申請IDを先に）
+
+        cursor.execute('DROP INDEX IF EXISTS idx_apps_tournament_date')
+
+        cursor.execute('''
+
+            CREATE INDEX IF NOT EXISTS idx_apps_tournament_date_id
+
+            ON player_applications (tournament_id, application_date DESC, id DESC)
+
+        ''')
+
+
+        
+        # アクティブな大会（is_active = 1 の行のみを持つ部分インデックス）
+
+        cursor.execute('''
+
+            CREATE INDEX IF NOT EXISTS idx_tournaments_active
+
+            ON tournaments (is_active) WHERE is_active = 1
+
+        ''')
+
+
+        
+        # 申請ごとの照合結果（証明書・統計の LEFT JOIN 用）
 
-        conn.close()
+        cursor.execute('''
+
+            CREATE INDEX IF NOT EXISTS idx_verif_app
+
+            ON verification_results (application_id)
+
+        ''')
+
+
+        
+        conn.commit()
 
 
 
@@ -762,35 +1070,33 @@ class TournamentManagement:
 
         """新しい大会を作成"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        with self.db_manager.transaction() as conn:
 
-        cursor = conn.cursor()
+            cursor = conn.cursor()
 
 
         
-        cursor.execute('''
+            cursor.execute('''
 
-            INSERT INTO tournaments (tournament_name, tournament_year, is_active, response_accepting)
+                INSERT INTO tournaments (tournament_name, tournament_year, is_active, response_accepting)
 
-            VALUES (?, ?, 1, 1)
+                VALUES (?, ?, 1, 1)
 
-        ''', (tournament_name, tournament_year))
+            ''', (tournament_name, tournament_year))
 
 
         
-        tournament_id = cursor.lastrowid
+            tournament_id = cursor.lastrowid
 
 
         
-        # 他の大会を非アクティブにする
+            # 他の大会を非アクティブにする
 
-        cursor.execute('UPDATE tournaments SET is_active = 0 WHERE id != ?', (tournament_id,))
+            cursor.execute('UPDATE tournaments SET is_active = 0 WHERE id != ?', (tournament_id,))
 
 
         
-        conn.commit()
 
-        conn.close()
 
 
         
@@ -802,7 +1108,7 @@ class TournamentManagement:
 
         """アクティブな大会を取得"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        conn = self.db_manager.connect()
 
         cursor = conn.cursor()
 
@@ -814,7 +1120,6 @@ class TournamentManagement:
 
 
         
-        conn.close()
 
 
         
@@ -842,7 +1147,7 @@ class TournamentManagement:
 
         """すべての大会を取得"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        conn = self.db_manager.connect()
 
         cursor = conn.cursor()
 
@@ -854,7 +1159,6 @@ class TournamentManagement:
 
 
         
-        conn.close()
 
 
         
@@ -886,27 +1190,25 @@ class TournamentManagement:
 
         """大会を切り替え"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        with self.db_manager.transaction() as conn:
 
-        cursor = conn.cursor()
+            cursor = conn.cursor()
 
 
         
-        # すべての大会を非アクティブにする
+            # すべての大会を非アクティブにする
 
-        cursor.execute('UPDATE tournaments SET is_active = 0')
+            cursor.execute('UPDATE tournaments SET is_active = 0')
 
 
         
-        # 指定された大会をアクティブにする
+            # 指定された大会をアクティブにする
 
-        cursor.execute('UPDATE tournaments SET is_active = 1 WHERE id = ?', (tournament_id,))
+            cursor.execute('UPDATE tournaments SET is_active = 1 WHERE id = ?', (tournament_id,))
 
 
         
-        conn.commit()
 
-        conn.close()
     
 
 
@@ -914,27 +1216,25 @@ class TournamentManagement:
 
         """大会の回答受付を設定"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        with self.db_manager.transaction() as conn:
 
-        cursor = conn.cursor()
+            cursor = conn.cursor()
 
 
         
-        cursor.execute('''
+            cursor.execute('''
 
-            UPDATE tournaments 
+                UPDATE tournaments 
 
-            SET response_accepting = ?, updated_at = CURRENT_TIMESTAMP 
+                SET response_accepting = ?, updated_at = CURRENT_TIMESTAMP 
 
-            WHERE id = ?
+                WHERE id = ?
 
-        ''', (accepting, tournament_id))
+            ''', (accepting, tournament_id))
 
 
         
-        conn.commit()
 
-        conn.close()
 
 
 
@@ -947,15 +1247,35 @@ class PrintSystem:
     def __init__(self, db_manager):
 
         self.db_manager = db_manager
+
+        # 発行済み証明書のキャッシュ（{申請ID: ((発行日, データバージョン), docxバイト列)}）
+        self._certificate_cache = {}
     
 
 
+    def get_certificate_bytes(self, application_id):
+        """仮選手証のdocxバイト列を取得（発行日とDBの内容が変わっていなければ作成済みのものを再利用）"""
+        # 他セッションでの修正や照合結果の更新でも data_version が変わるため、古い証明書は使われない
+        key = (datetime.now().strftime('%Y%m%d'), self.db_manager.data_version())
+        cached = self._certificate_cache.get(application_id)
+        if cached and cached[0] == key:
+            return cached[1]
+        doc = self.create_individual_certificate(application_id)
+        if not doc:
+            return None
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        self._certificate_cache[application_id] = (key, buffer.getvalue())
+        return self._certificate_cache[application_id][1]
+
+
+
     def create_individual_certificate(self, application_id):
 
         """個別の仮選手証を作成（A4縦サイズ、8枚配置）"""
         try:
 
-            conn = sqlite3.connect(self.db_manager.db_path)
+            conn = self.db_manager.connect()
 
             cursor = conn.cursor()
 
@@ -998,7 +1318,6 @@ class PrintSystem:
             
             result = cursor.fetchone()
 
-            conn.close()
 
 
             
@@ -1103,6 +1422,43 @@ class PrintSystem:
 
 
 
+@st.cache_resource
+def _settings_cipher():
+    """admin_settings の秘密値を暗号化する Fernet を取得（鍵は環境変数 KNE_SETTINGS_KEY、未設定時は鍵ファイルを初回に生成）"""
+    key = os.environ.get("KNE_SETTINGS_KEY")
+    if not key:
+        try:
+            fd = os.open(SETTINGS_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(SETTINGS_KEY_PATH, "rb") as f:
+                key = f.read().strip()
+        else:
+            key = Fernet.generate_key()
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+    return Fernet(key)
+
+
+def _encrypt_setting(value):
+    """設定値を暗号化（空文字はそのまま、暗号化した値には接頭辞を付ける）"""
+    if not value:
+        return value
+    return _ENCRYPTED_PREFIX + _settings_cipher().encrypt(value.encode()).decode()
+
+
+def _decrypt_setting(value):
+    """設定値を復号（接頭辞のない値は暗号化前に保存された平文としてそのまま返し、次回保存時に暗号化される）"""
+    if not value or not value.startswith(_ENCRYPTED_PREFIX):
+        return value
+    try:
+        return _settings_cipher().decrypt(value[len(_ENCRYPTED_PREFIX):].encode()).decode()
+    except InvalidToken:
+        # 鍵の紛失・変更時は暗号文をパスワードとして扱わず、再入力を促す
+        st.error("保存済みのJBAパスワードを復号できませんでした（暗号鍵が変更された可能性があります）。パスワードを再入力して保存してください。")
+        return ""
+
+
+
 class AdminDashboard:
 
     """管理者ダッシュボード"""
@@ -1121,7 +1477,7 @@ class AdminDashboard:
 
         """システム設定を取得"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        conn = self.db_manager.connect()
 
         cursor = conn.cursor()
 
@@ -1133,7 +1489,6 @@ class AdminDashboard:
 
 
         
-        conn.close()
 
 
         
@@ -1143,7 +1498,7 @@ class AdminDashboard:
 
                 'jba_email': result[1],
 
-                'jba_password': result[2],
+                'jba_password': _decrypt_setting(result[2]),
 
                 'notification_email': result[3],
 
@@ -1163,52 +1518,46 @@ class AdminDashboard:
 
         """システム設定を保存"""
 
-        conn = sqlite3.connect(self.db_manager.db_path)
+        with self.db_manager.transaction() as conn:
 
-        cursor = conn.cursor()
+            cursor = conn.cursor()
 
 
         
-        cursor.execute('''
+            cursor.execute('''
 
-            INSERT OR REPLACE INTO admin_settings 
+                INSERT OR REPLACE INTO admin_settings 
 
-            (jba_email, jba_password, notification_email, auto_verification_enabled, 
+                (jba_email, jba_password, notification_email, auto_verification_enabled, 
 
-             verification_threshold, current_tournament_id, updated_at)
+                 verification_threshold, current_tournament_id, updated_at)
 
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
 
-        ''', (
+            ''', (
 
-            settings.get('jba_email', ''),
+                settings.get('jba_email', ''),
 
-            settings.get('jba_password', ''),
+                _encrypt_setting(settings.get('jba_password', '')),
 
-            settings.get('notification_email', ''),
+                settings.get('notification_email', ''),
 
-            settings.get('auto_verification_enabled', True),
+                settings.get('auto_verification_enabled', True),
 
-            settings.get('verification_threshold', 1.0),
+                settings.get('verification_threshold', 1.0),
 
-            settings.get('current_tournament_id', None)
+                settings.get('current_tournament_id', None)
 
-        ))
+            ))
 
 
         
-        conn.commit()
-
-        conn.close()
 
 
 
-def main():
-
-    """メイン関数"""
 
-    # カスタムCSS（JBAサイト風デザイン）
-    st.markdown("""
+# カスタムCSS（JBAサイト風デザイン）
+_APP_CSS = """
     <style>
     /* カラーパレット - JBAサイト風 */
     :root {
@@ -1459,30 +1808,117 @@ def main():
         }
     }
     </style>
-    """, unsafe_allow_html=True)
+"""
 
-    # メインヘッダー
-    import base64
-    import os
-    
+
+def inject_styles():
+    """カスタムCSSを挿入（Streamlitは再実行ごとに画面を組み直すため毎回出力する）"""
+    st.markdown(_APP_CSS, unsafe_allow_html=True)
+
+
+@st.cache_resource
+def get_db_manager():
+    """DatabaseManager をプロセス全体で1つだけ生成（共有コネクションを再実行・セッション間で使い回す）"""
+    return DatabaseManager()
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def count_applications(tournament_id, data_version):
+    """大会の申請件数を取得（data_version が変わるまでキャッシュを再利用）"""
+    cursor = get_db_manager().connect().cursor()
+    cursor.execute('SELECT COUNT(*) FROM player_applications WHERE tournament_id = ?', (tournament_id,))
+    return cursor.fetchone()[0]
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def load_applications_page(tournament_id, page, data_version):
+    """照合タブの申請一覧（1ページ分）を取得（data_version が変わるまでキャッシュを再利用）"""
+    cursor = get_db_manager().connect().cursor()
+    cursor.execute('''
+        SELECT id, player_name, birth_date, university, division, role, application_date, verification_result
+        FROM player_applications 
+        WHERE tournament_id = ?
+        ORDER BY application_date DESC, id DESC
+        LIMIT ? OFFSET ?
+    ''', (tournament_id, APPLICATIONS_PAGE_SIZE, (page - 1) * APPLICATIONS_PAGE_SIZE))
+    return cursor.fetchall()
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def load_verification_stats(tournament_id, data_version):
+    """統計タブの照合結果件数（マッチ・未マッチ・複数候補）を取得（data_version が変わるまでキャッシュを再利用）"""
+    cursor = get_db_manager().connect().cursor()
+    cursor.execute('''
+        SELECT 
+            COUNT(CASE WHEN vr.match_status = 'マッチ' THEN 1 END) as matched,
+            COUNT(CASE WHEN vr.match_status = '未マッチ' THEN 1 END) as unmatched,
+            COUNT(CASE WHEN vr.match_status = '複数候補' THEN 1 END) as multiple
+        FROM player_applications pa
+        LEFT JOIN verification_results vr ON pa.id = vr.application_id
+        WHERE pa.tournament_id = ?
+    ''', (tournament_id,))
+    return cursor.fetchone()
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def load_print_applications(tournament_id, data_version):
+    """印刷タブの申請一覧を取得（data_version が変わるまでキャッシュを再利用）"""
+    cursor = get_db_manager().connect().cursor()
+    cursor.execute('''
+        SELECT id, player_name, university, role, application_date
+        FROM player_applications 
+        WHERE tournament_id = ?
+        ORDER BY application_date DESC, id DESC
+    ''', (tournament_id,))
+    return cursor.fetchall()
+
+
+@st.cache_resource
+def _header_html():
+    """ロゴ付きヘッダーのHTMLを組み立て（ロゴの読み込み・base64化は初回のみ、以降はキャッシュを再利用）"""
     try:
-        logo_path = os.path.join("kne", "kcbf_logo.png")
-        with open(logo_path, "rb") as img_file:
+        with open(os.path.join("kne", "kcbf_logo.png"), "rb") as img_file:
             logo_base64 = base64.b64encode(img_file.read()).decode()
-        
-        st.markdown(f"""
-        <div class="main-header">
-            <h1><img src="data:image/png;base64,{logo_base64}" alt="KCBF Logo" style="width: 40px; height: 40px; margin-right: 10px; vertical-align: middle;">仮選手証・スタッフ証発行システム</h1>
-            <p>関東大学バスケットボール連盟</p>
-        </div>
-        """, unsafe_allow_html=True)
+        logo_img = f'<img src="data:image/png;base64,{logo_base64}" alt="KCBF Logo" style="width: 40px; height: 40px; margin-right: 10px; vertical-align: middle;">'
     except FileNotFoundError:
-        st.markdown("""
+        logo_img = ""
+    return f"""
         <div class="main-header">
-            <h1>仮選手証・スタッフ証発行システム</h1>
+            <h1>{logo_img}仮選手証・スタッフ証発行システム</h1>
             <p>関東大学バスケットボール連盟</p>
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+
+def render_header_logo():
+    """ロゴ付きのメインヘッダーを表示"""
+    st.markdown(_header_html(), unsafe_allow_html=True)
+
+
+def _save_upload(upload, directory, prefix):
+    """アップロードファイルを内容のSHA-256で命名して保存し、保存先パスを返す（同一内容なら既存ファイルを再利用）"""
+    digest = hashlib.sha256(upload.getbuffer()).hexdigest()
+    extension = os.path.splitext(upload.name)[1].lower()
+    dest = os.path.join(directory, f"{prefix}_{digest}{extension}")
+    if not os.path.exists(dest):
+        # 書き込み途中のファイルが再利用されないよう、一時ファイルに書いてから置き換える
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        upload.seek(0)
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(upload, f, 1 << 20)
+        os.replace(tmp_path, dest)
+    return dest
+
+
+def main():
+
+    """メイン関数"""
+
+    # カスタムCSS（JBAサイト風デザイン）
+    inject_styles()
+
+    # メインヘッダー
+    render_header_logo()
 
     # サイドバー（システム情報を削除）
 
@@ -1491,7 +1927,7 @@ def main():
 
     if 'db_manager' not in st.session_state:
 
-        st.session_state.db_manager = DatabaseManager()
+        st.session_state.db_manager = get_db_manager()
     
 
 
@@ -1522,23 +1958,8 @@ def main():
     # URLクエリパラメータの取得（最新版対応）
     query_params = st.query_params
     
-    # ロール判定ロジック
-    admin_mode = False
-    
-    if query_params:
-        # 複数のキーをチェック
-        for key in ["role", "mode", "page"]:
-            if key in query_params:
-                val = query_params[key]
-                # Streamlit 1.31+ では文字列が返される
-                if isinstance(val, str):
-                    admin_mode = val.lower() == "admin"
-                # それ以前はリストが返される場合もある
-                elif isinstance(val, list) and len(val) > 0:
-                    admin_mode = val[0].lower() == "admin"
-                
-                if admin_mode:
-                    break
+    # ロール判定ロジック（いずれかのキーが admin なら管理者モード）
+    admin_mode = any(query_params.get(key, "").lower() == "admin" for key in ADMIN_QUERY_KEYS)
     
     st.session_state.is_admin = admin_mode
     
@@ -1668,14 +2089,10 @@ def main():
                     bulk_submit = st.form_submit_button("一括申請送信", type="primary")
 
                 if bulk_submit:
-                    conn = sqlite3.connect(st.session_state.db_manager.db_path)
-                    cursor = conn.cursor()
-                    application_ids = []
-                    added_count = 0
+                    application_rows = []
                     skipped = 0
                     
                     # 写真保存用のディレクトリを作成
-                    import os
                     photos_dir = "uploaded_photos"
                     os.makedirs(photos_dir, exist_ok=True)
                     
@@ -1691,45 +2108,24 @@ def main():
                         # 写真保存処理
                         photo_path = None
                         if photo_file is not None:
-                            # ファイル名を生成（申請ID + 元ファイル名）
-                            file_extension = os.path.splitext(photo_file.name)[1]
-                            photo_filename = f"photo_{i+1}_{name_val.replace(' ', '_')}{file_extension}"
-                            photo_path = os.path.join(photos_dir, photo_filename)
-                            
-                            # ファイルを保存
-                            with open(photo_path, "wb") as f:
-                                f.write(photo_file.getbuffer())
+                            photo_path = _save_upload(photo_file, photos_dir, "photo")
                         
                         # JBAファイル保存処理
                         jba_path = None
                         if jba_file is not None:
-                            file_extension = os.path.splitext(jba_file.name)[1]
-                            jba_filename = f"jba_{i+1}_{name_val.replace(' ', '_')}{file_extension}"
-                            jba_path = os.path.join(photos_dir, jba_filename)
-                            
-                            with open(jba_path, "wb") as f:
-                                f.write(jba_file.getbuffer())
+                            jba_path = _save_upload(jba_file, photos_dir, "jba")
                         
                         # スタッフファイル保存処理
                         staff_path = None
                         if staff_file is not None:
-                            file_extension = os.path.splitext(staff_file.name)[1]
-                            staff_filename = f"staff_{i+1}_{name_val.replace(' ', '_')}{file_extension}"
-                            staff_path = os.path.join(photos_dir, staff_filename)
-                            
-                            with open(staff_path, "wb") as f:
-                                f.write(staff_file.getbuffer())
+                            staff_path = _save_upload(staff_file, photos_dir, "staff")
 
                         # 必須チェック（名前＋生年月日）
                         if not name_val or not birth_val:
                             skipped += 1
                             continue
 
-                        cursor.execute('''
-                            INSERT INTO player_applications 
-                            (tournament_id, player_name, birth_date, university, division, role, remarks, photo_path, jba_file_path, staff_file_path, verification_result, jba_match_data)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
+                        application_rows.append((
                             active_tournament['id'],
                             name_val,
                             birth_val.strftime('%Y/%m/%d'),
@@ -1743,11 +2139,12 @@ def main():
                             "pending",
                             ""
                         ))
-                        application_ids.append(cursor.lastrowid)
-                        added_count += 1
 
-                    conn.commit()
-                    conn.close()
+                    # まとめて1トランザクションで登録
+                    application_ids = []
+                    if application_rows:
+                        application_ids = st.session_state.db_manager.bulk_insert_applications(application_rows)
+                    added_count = len(application_ids)
 
                     if added_count:
                         st.success(f"{added_count}名の申請が送信されました")
@@ -1789,7 +2186,11 @@ def main():
 
                 if jba_email and jba_password:
 
-                    if st.session_state.jba_system.login(jba_email, jba_password):
+                    with st.spinner("JBAサイトにログイン中..."):
+
+                        logged_in = st.session_state.jba_system.login(jba_email, jba_password)
+
+                    if logged_in:
 
                         st.success("ログイン成功")
 
@@ -1800,6 +2201,12 @@ def main():
                 else:
 
                     st.error("ログイン情報を入力してください")
+
+            if st.button("JBA取得データのキャッシュをクリア"):
+
+                st.session_state.jba_system.clear_cache()
+
+                st.success("キャッシュをクリアしました")
         
 
 
@@ -1815,8 +2222,8 @@ def main():
 
             else:
 
-                st.info("チーム情報を取得中...")
-                team_data = st.session_state.jba_system.get_team_members(team_url)
+                with st.spinner("チーム情報を取得中..."):
+                    team_data = st.session_state.jba_system.get_team_members(team_url)
 
                 if team_data and team_data["members"]:
                     st.success(f"チーム情報を取得しました")
@@ -1841,29 +2248,38 @@ def main():
 
         if active_tournament:
 
-            conn = sqlite3.connect(st.session_state.db_manager.db_path)
+            data_version = st.session_state.db_manager.data_version()
 
-            cursor = conn.cursor()
-            
-            
-
-            cursor.execute('''
+            total_applications = count_applications(active_tournament['id'], data_version)
 
-                SELECT id, player_name, birth_date, university, division, role, application_date, verification_result
-                FROM player_applications 
-                WHERE tournament_id = ?
-                ORDER BY application_date DESC
-            ''', (active_tournament['id'],))
-            
-            
+            # ページ送り（全件ではなく表示ページ分のみ取得）
+            total_pages = max(1, -(-total_applications // APPLICATIONS_PAGE_SIZE))
+            # ラベルや上限をページ数に連動させるとウィジェットが作り直されて1ページ目に戻るため固定し、上限はここで丸める
+            if st.session_state.get("applications_page", 1) > total_pages:
+                st.session_state.applications_page = total_pages
+            page = min(st.number_input("ページ", min_value=1, step=1, key="applications_page"), total_pages)
+            st.caption(f"全{total_pages}ページ")
 
-            applications = cursor.fetchall()
-            conn.close()
+            applications = load_applications_page(active_tournament['id'], page, data_version)
             
 
 
             if applications:
-                st.write(f"**{active_tournament['tournament_name']}** の申請一覧")
+                st.write(f"**{active_tournament['tournament_name']}** の申請一覧（{total_applications}件）")
+
+                # 表示中ページの未確定申請を選んで一括確定
+                unconfirmed_ids = [app[0] for app in applications if app[7] != "confirmed"]
+                if unconfirmed_ids:
+                    col_select, col_bulk = st.columns([3, 1])
+                    with col_select:
+                        bulk_confirm_ids = st.multiselect("一括確定する申請ID", unconfirmed_ids, key=f"bulk_confirm_{page}")
+                    with col_bulk:
+                        if st.button("選択した申請を確定", key="bulk_confirm_submit", disabled=not bulk_confirm_ids):
+                            st.session_state.db_manager.update_verification_results(
+                                [("confirmed", app_id) for app_id in bulk_confirm_ids]
+                            )
+                            st.success(f"{len(bulk_confirm_ids)}件を確定しました")
+                            st.rerun()
 
                 for app in applications:
                     app_id, player_name, birth_date, university, division, role, app_date, verification_status = app
@@ -1906,10 +2322,10 @@ def main():
                                     if not st.session_state.jba_system.logged_in:
                                         st.error("先にJBAにログインしてください")
                                     else:
-                                        st.info("JBAデータベースと照合中...")
-                                        verification_result = st.session_state.jba_system.verify_player_info(
-                                            player_name, birth_date, university
-                                        )
+                                        with st.spinner("JBAデータベースと照合中..."):
+                                            verification_result = st.session_state.jba_system.verify_player_info(
+                                                player_name, birth_date, university
+                                            )
                                         
                                         # 照合結果をセッションに保存
                                         st.session_state[f"verification_result_{app_id}"] = verification_result
@@ -1926,17 +2342,7 @@ def main():
                                 if verification_status != "confirmed":
                                     if st.button(f"確定", key=f"confirm_{app_id}", type="primary"):
                                         # 確定処理
-                                        conn = sqlite3.connect(st.session_state.db_manager.db_path)
-                                        cursor = conn.cursor()
-
-                                        cursor.execute('''
-                                            UPDATE player_applications 
-                                            SET verification_result = ?
-                                            WHERE id = ?
-                                        ''', ("confirmed", app_id))
-
-                                        conn.commit()
-                                        conn.close()
+                                        st.session_state.db_manager.update_verification_results([("confirmed", app_id)])
                                         st.success("確定しました")
                                         st.rerun()
                                 else:
@@ -1969,17 +2375,12 @@ def main():
                                     with col_save:
                                         if st.form_submit_button("保存"):
                                             # 修正内容をDBに保存
-                                            conn = sqlite3.connect(st.session_state.db_manager.db_path)
-                                            cursor = conn.cursor()
-                                            
-                                            cursor.execute('''
-                                                UPDATE player_applications 
-                                                SET player_name = ?, birth_date = ?, university = ?
-                                                WHERE id = ?
-                                            ''', (modified_name, modified_birth, modified_university, app_id))
-                                            
-                                            conn.commit()
-                                            conn.close()
+                                            with st.session_state.db_manager.transaction() as conn:
+                                                conn.execute('''
+                                                    UPDATE player_applications 
+                                                    SET player_name = ?, birth_date = ?, university = ?
+                                                    WHERE id = ?
+                                                ''', (modified_name, modified_birth, modified_university, app_id))
                                             
                                             st.success("修正内容を保存しました")
                                             st.session_state[f"show_modify_form_{app_id}"] = False
@@ -2015,29 +2416,10 @@ def main():
 
         if active_tournament:
 
-            conn = sqlite3.connect(st.session_state.db_manager.db_path)
-
-            cursor = conn.cursor()
-
-
-            
-            cursor.execute('''
-
-                SELECT id, player_name, university, role, application_date
-
-                FROM player_applications 
-
-                WHERE tournament_id = ?
-
-                ORDER BY application_date DESC
-
-            ''', (active_tournament['id'],))
-
-
-            
-            applications = cursor.fetchall()
+            applications = load_print_applications(
+                active_tournament['id'], st.session_state.db_manager.data_version()
+            )
 
-            conn.close()
 
 
             
@@ -2045,43 +2427,38 @@ def main():
 
                 st.write(f"**申請一覧** ({len(applications)}件)")
 
-
-                
-                for app in applications:
-
-                    col1, col2, col3 = st.columns([3, 1, 1])
-
-
-                    
-                    with col1:
-
-                        st.write(f"**{app[1]}** ({app[2]}) - {app[3]}")
-
-                        st.write(f"申請日: {app[4]}")
-                    
-
-
-                    with col2:
-
-                        if st.button(f"印刷", key=f"print_{app[0]}"):
-                            try:
-                                doc = st.session_state.print_system.create_individual_certificate(app[0])
-
-                                if doc:
-                                    # ファイル名を生成
-                                    filename = f"仮選手証_{app[1]}_{app[0]}.docx"
-                                    doc.save(filename)
-                                    st.success(f"{filename} を作成しました")
-                            except Exception as e:
-                                st.error(f"印刷エラー: {str(e)}")
-
-                        with col3:
-                            if st.button(f"詳細", key=f"detail_{app[0]}"):
-                                st.session_state.selected_application = app[0]
-                                st.rerun()
-
-                    
-                    st.divider()
+                # 行ごとのボタンではなく、選択可能な表1つで一覧を表示
+                print_df = pd.DataFrame(applications, columns=["申請ID", "氏名", "大学", "役職", "申請日"])
+                event = st.dataframe(
+                    print_df, hide_index=True, use_container_width=True,
+                    on_select="rerun", selection_mode="single-row", key="print_applications"
+                )
+
+                # 大会切替などで一覧が変わった場合に古い選択位置を参照しないよう範囲を確認
+                selected_rows = [row for row in event.selection.rows if row < len(applications)]
+                if selected_rows:
+                    app_id, player_name = applications[selected_rows[0]][:2]
+                    st.session_state.selected_application = app_id
+
+                    if st.button(f"{player_name} の仮選手証を印刷", key="print_selected", type="primary"):
+                        try:
+                            data = st.session_state.print_system.get_certificate_bytes(app_id)
+
+                            if data:
+                                # ファイル名を生成
+                                filename = f"仮選手証_{player_name}_{app_id}.docx"
+                                st.download_button(
+                                    "ダウンロード",
+                                    data=data,
+                                    file_name=filename,
+                                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                                    key=f"download_{app_id}"
+                                )
+                                st.success(f"{filename} を作成しました")
+                        except Exception as e:
+                            st.error(f"印刷エラー: {str(e)}")
+                else:
+                    st.info("印刷する申請を一覧から選択してください")
 
             else:
 
@@ -2105,30 +2482,14 @@ def main():
             # アクティブな大会の統計
             active_tournament = st.session_state.tournament_management.get_active_tournament()
             if active_tournament:
-                conn = sqlite3.connect(st.session_state.db_manager.db_path)
-                cursor = conn.cursor()
+                data_version = st.session_state.db_manager.data_version()
 
                 # 申請数
-                cursor.execute('SELECT COUNT(*) FROM player_applications WHERE tournament_id = ?', (active_tournament['id'],))
-                total_applications = cursor.fetchone()[0]
+                total_applications = count_applications(active_tournament['id'], data_version)
 
                 # 照合結果
-                cursor.execute('''
-                    SELECT 
-                        COUNT(CASE WHEN vr.match_status = 'マッチ' THEN 1 END) as matched,
-                        COUNT(CASE WHEN vr.match_status = '未マッチ' THEN 1 END) as unmatched,
-                        COUNT(CASE WHEN vr.match_status = '複数候補' THEN 1 END) as multiple
-                    FROM player_applications pa
-                    LEFT JOIN verification_results vr ON pa.id = vr.application_id
-                    WHERE pa.tournament_id = ?
-                ''', (active_tournament['id'],))
-
-                result = cursor.fetchone()
-                matched = result[0] if result[0] else 0
-                unmatched = result[1] if result[1] else 0
-                multiple = result[2] if result[2] else 0
-
-                conn.close()
+                matched, unmatched, multiple = load_verification_stats(active_tournament['id'], data_version)
+
 
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
@@ -2273,7 +2634,13 @@ def main():
 
             st.subheader("システム設定")
 
-            settings = st.session_state.admin_dashboard.get_system_settings()
+            # 設定は保存時のみ読み直し、それ以外の再実行ではセッションの値を使う
+
+            if 'system_settings' not in st.session_state:
+
+                st.session_state.system_settings = st.session_state.admin_dashboard.get_system_settings()
+
+            settings = st.session_state.system_settings
 
 
             
@@ -2317,6 +2684,8 @@ def main():
                         
                         st.session_state.admin_dashboard.save_system_settings(new_settings)
 
+                        st.session_state.system_settings = st.session_state.admin_dashboard.get_system_settings()
+
                         st.success("設定を保存しました")
 
 